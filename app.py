@@ -1,92 +1,185 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, make_response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
 from flask_cors import CORS
+import msgspec
 import numpy as np
-import pandas as pd
-from datetime import datetime, timedelta
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache, wraps
+from operator import itemgetter
+from threading import Lock
+from typing import Optional
+import hashlib
+import heapq
 import json
 import os
 from ml_model import EmissionPredictor
-from database import Database
+from database import Database, SQLiteDatabase
+from config import FLAT_EMISSION_FACTORS as EMISSION_FACTORS, ECO_ALTERNATIVES, get_config
+
+
+def _orjson_default(obj):
+    """Fallback for types orjson does not serialize natively"""
+    if isinstance(obj, date):
+        # Subclasses such as pandas.Timestamp are not handled natively
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for faster API responses"""
+    
+    compact = True
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj,
+            default=_orjson_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
+app.json = OrjsonProvider(app)
 CORS(app)
+cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 300})
 
 # Initialize database and ML model
-db = Database()
+app_config = get_config()
+if app_config.DATABASE_BACKEND == 'sqlite':
+    db = SQLiteDatabase(app_config.SQLITE_DATABASE_FILE)
+else:
+    db = Database()
 ml_predictor = EmissionPredictor()
 
-# Emission factors (kg CO2 per unit)
-EMISSION_FACTORS = {
-    'car': 0.21,  # per km
-    'bus': 0.089,  # per km
-    'train': 0.041,  # per km
-    'flight': 0.255,  # per km
-    'electricity': 0.92,  # per kWh
-    'natural_gas': 2.04,  # per cubic meter
-    'water': 0.34,  # per liter
-    'meat': 27.0,  # per kg
-    'vegetables': 2.0,  # per kg
-    'dairy': 3.2,  # per kg
-    'waste': 0.5,  # per kg
-}
-
-# Eco-friendly alternatives
-ECO_ALTERNATIVES = {
-    'car': {
-        'alternative': 'Electric Car',
-        'reduction_percent': 70,
-        'description': 'Switch to electric vehicle reduces emissions by 70%',
-        'cost_savings': 'Save $500-800/year on fuel'
-    },
-    'bus': {
-        'alternative': 'Bicycle/Walk',
-        'reduction_percent': 100,
-        'description': 'Use bicycle for short trips eliminates emissions',
-        'cost_savings': 'No fuel cost'
-    },
-    'train': {
-        'alternative': 'Already Eco-Friendly',
-        'reduction_percent': 0,
-        'description': 'Train is already 95% more efficient than car',
-        'cost_savings': 'Lowest carbon transport'
-    },
-    'flight': {
-        'alternative': 'Video Conference',
-        'reduction_percent': 100,
-        'description': 'Video conferencing eliminates travel emissions',
-        'cost_savings': 'Save on travel costs'
-    },
-    'electricity': {
-        'alternative': 'Solar/Renewable',
-        'reduction_percent': 85,
-        'description': 'Switch to renewable energy reduces emissions significantly',
-        'cost_savings': 'Save $200-400/year'
-    },
-    'natural_gas': {
-        'alternative': 'Heat Pump',
-        'reduction_percent': 50,
-        'description': 'Modern heat pumps are more efficient',
-        'cost_savings': 'Save 30% on heating'
-    },
-    'meat': {
-        'alternative': 'Vegetarian Days',
-        'reduction_percent': 80,
-        'description': 'Reduce meat by 2-3 days/week cuts emissions significantly',
-        'cost_savings': 'Save $40-60/month'
-    },
-    'vegetables': {
-        'alternative': 'Local Produce',
-        'reduction_percent': 30,
-        'description': 'Buy local vegetables to reduce transport emissions',
-        'cost_savings': 'Support local farmers'
-    },
-    'dairy': {
-        'alternative': 'Plant-based Alternatives',
-        'reduction_percent': 75,
-        'description': 'Plant-based dairy alternatives have 75% lower emissions',
-        'cost_savings': 'Often cheaper'
-    }
-}
+# Load existing model if available (runs in every gunicorn worker)
+ml_predictor.load_model()
+
+
+# Retrain the ML model after this many single-entry logs
+RETRAIN_EVERY = 10
+
+# Model training runs on a single background worker so requests never wait on it
+_retrain_executor = ThreadPoolExecutor(max_workers=1)
+_retrain_lock = Lock()
+_retrain_future = None
+
+
+def retrain_model(all_emissions):
+    """Schedule a background retrain of the ML model if there is enough data"""
+    global _retrain_future
+    
+    if len(all_emissions) < 5:
+        return
+    
+    with _retrain_lock:
+        # A queued retrain is superseded by this one; a running one finishes
+        if _retrain_future is not None:
+            _retrain_future.cancel()
+        _retrain_future = _retrain_executor.submit(ml_predictor.train_model, list(all_emissions))
+
+
+class EmissionIn(msgspec.Struct):
+    """Emission activity as posted by clients, decoded straight from the request body"""
+    
+    type: str
+    value: float = 0.0
+    date: Optional[str] = None
+    notes: str = ''
+    category: str = 'general'
+
+
+def _data_cache_key(*args, **kwargs):
+    """Cache key for read endpoints, invalidated by any database write"""
+    return f"{request.path}:{request.query_string.decode()}:{db.version}"
+
+
+# Distinguishes ETags across restarts, since db.version starts from zero again
+_BOOT_ID = os.urandom(8).hex()
+
+
+def _data_etag():
+    """ETag for data-backed responses, changed by any database write"""
+    key = f"{_BOOT_ID}:{db.version}:{request.full_path}"
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def _emissions_etag():
+    """ETag for get-emissions; windowed periods depend on the clock, so they get none"""
+    if request.args.get('period', 'all') in ('week', 'month', 'year'):
+        return None
+    return _data_etag()
+
+
+def etag_conditional(make_etag):
+    """Reply 304 Not Modified when the client's cached copy is still current"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = make_etag()
+            if etag is None:
+                return view(*args, **kwargs)
+            if etag in request.if_none_match:
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+
+# Valid activity types, built once for request validation and error messages
+EMISSION_FACTOR_KEYS = frozenset(EMISSION_FACTORS)
+VALID_TYPES_LIST = list(EMISSION_FACTORS)
+
+# Fixed validation error responses, encoded once at import
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+_INVALID_TYPE_RESP = (
+    orjson.dumps({'error': f'Invalid activity type. Valid types: {VALID_TYPES_LIST}'}),
+    400,
+    _JSON_HEADERS
+)
+_NEGATIVE_VALUE_RESP = (orjson.dumps({'error': 'Value must be positive'}), 400, _JSON_HEADERS)
+
+# Array form of the emission factors for vectorized scoring
+_TYPE_IDX = {activity_type: i for i, activity_type in enumerate(EMISSION_FACTORS)}
+_FACTORS = np.array(list(EMISSION_FACTORS.values()), dtype=np.float64)
+
+
+# Activity types only change on deploy, so their ETag is fixed at import
+_ACTIVITY_TYPES_ETAG = hashlib.md5(
+    orjson.dumps(dict(EMISSION_FACTORS)), usedforsecurity=False
+).hexdigest()
+
+
+def compute_emissions(types_arr, values_arr):
+    """Compute emissions for parallel sequences of activity types and values"""
+    idx = np.fromiter((_TYPE_IDX[t] for t in types_arr), dtype=np.intp, count=len(types_arr))
+    return _FACTORS[idx] * np.asarray(values_arr, dtype=np.float64)
+
+
+@lru_cache(maxsize=1)
+def _aggregate_snapshot(version):
+    """Aggregates for one data version, shared by the dashboard endpoints"""
+    return db.get_emission_totals()
+
+
+@lru_cache(maxsize=16)
+def _cached_predict(version, model_version, days_ahead):
+    """Forecast for one data and model version, reused by repeated dashboard polls"""
+    return ml_predictor.predict_future(db.get_all_emissions(), days_ahead)
+
 
 # ==================== Page Routes ====================
 
@@ -110,17 +203,15 @@ def health_check():
 def log_emission():
     """Log a new emission activity"""
     try:
-        data = request.json
-        activity_type = data.get('type')
-        value = float(data.get('value', 0))
+        data = msgspec.json.decode(request.get_data(), type=EmissionIn, strict=False)
+        activity_type = data.type
+        value = data.value
         
-        if activity_type not in EMISSION_FACTORS:
-            return jsonify({
-                'error': f'Invalid activity type. Valid types: {list(EMISSION_FACTORS.keys())}'
-            }), 400
+        if activity_type not in EMISSION_FACTOR_KEYS:
+            return _INVALID_TYPE_RESP
         
         if value < 0:
-            return jsonify({'error': 'Value must be positive'}), 400
+            return _NEGATIVE_VALUE_RESP
         
         emissions = value * EMISSION_FACTORS[activity_type]
         
@@ -128,35 +219,88 @@ def log_emission():
             'type': activity_type,
             'value': value,
             'emissions': emissions,
-            'date': data.get('date', datetime.now().isoformat()),
-            'notes': data.get('notes', ''),
-            'category': data.get('category', 'general')
+            'date': data.date or datetime.now().isoformat(),
+            'notes': data.notes,
+            'category': data.category
         })
         
-        # Retrain model with new data
-        all_emissions = db.get_all_emissions()
-        if len(all_emissions) >= 5:
-            ml_predictor.train_model(all_emissions)
+        # Retrain model periodically rather than on every single entry
+        if db.get_emissions_count() % RETRAIN_EVERY == 0:
+            retrain_model(db.get_all_emissions())
         
         return jsonify({
             'success': True,
             'emissions_kg_co2': round(emissions, 2),
             'entry': entry
         }), 201
-    except ValueError as e:
+    except (msgspec.DecodeError, ValueError) as e:
+        return jsonify({'error': f'Invalid input: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/log-emissions-bulk', methods=['POST'])
+def log_emissions_bulk():
+    """Log several emission activities in one request"""
+    try:
+        data = msgspec.json.decode(request.get_data(), type=list[EmissionIn], strict=False)
+        if not data:
+            return jsonify({'error': 'Expected a non-empty list of emission activities'}), 400
+        
+        types = []
+        values = []
+        for i, item in enumerate(data):
+            activity_type = item.type
+            value = item.value
+            
+            if activity_type not in EMISSION_FACTOR_KEYS:
+                return jsonify({
+                    'error': f'Invalid activity type at index {i}. Valid types: {VALID_TYPES_LIST}'
+                }), 400
+            
+            if value < 0:
+                return jsonify({'error': f'Value must be positive (index {i})'}), 400
+            
+            types.append(activity_type)
+            values.append(value)
+        
+        emissions = compute_emissions(types, values)
+        now = datetime.now().isoformat()
+        
+        entries = db.add_emissions_bulk([
+            {
+                'type': activity_type,
+                'value': value,
+                'emissions': float(item_emissions),
+                'date': item.date or now,
+                'notes': item.notes,
+                'category': item.category
+            }
+            for item, activity_type, value, item_emissions in zip(data, types, values, emissions)
+        ])
+        
+        # Retrain once for the whole batch
+        retrain_model(db.get_all_emissions())
+        
+        return jsonify({
+            'success': True,
+            'count': len(entries),
+            'emissions_kg_co2': round(float(emissions.sum()), 2),
+            'entries': entries
+        }), 201
+    except (msgspec.DecodeError, ValueError) as e:
         return jsonify({'error': f'Invalid input: {str(e)}'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/get-emissions', methods=['GET'])
+@etag_conditional(_emissions_etag)
+@cache.cached(timeout=300, make_cache_key=_data_cache_key)
 def get_emissions():
     """Get emission records with filtering"""
     try:
         period = request.args.get('period', 'all')
         activity_type = request.args.get('type', None)
         
-        emissions = db.get_all_emissions()
-        
         if period == 'week':
             cutoff = datetime.now() - timedelta(days=7)
         elif period == 'month':
@@ -166,11 +310,8 @@ def get_emissions():
         else:
             cutoff = None
         
-        if cutoff:
-            emissions = [
-                e for e in emissions 
-                if datetime.fromisoformat(e['date']) > cutoff
-            ]
+        # Newest first, already cut off via the database's sorted date index
+        emissions = db.get_emissions_since(cutoff)
         
         if activity_type:
             emissions = [e for e in emissions if e['type'] == activity_type]
@@ -182,18 +323,20 @@ def get_emissions():
             'total_emissions_kg': round(total_emissions, 2),
             'average_daily_emissions': round(avg_emissions, 2),
             'count': len(emissions),
-            'records': sorted(emissions, key=lambda x: x['date'], reverse=True)
+            'records': emissions
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/get-summary', methods=['GET'])
+@etag_conditional(_data_etag)
+@cache.cached(timeout=300, make_cache_key=_data_cache_key)
 def get_summary():
     """Get summary statistics"""
     try:
-        emissions = db.get_all_emissions()
+        count = db.get_emissions_count()
         
-        if not emissions:
+        if not count:
             return jsonify({
                 'total_emissions_kg': 0,
                 'monthly_average_kg': 0,
@@ -203,23 +346,19 @@ def get_summary():
                 'total_records': 0
             }), 200
         
-        df = pd.DataFrame(emissions)
-        total = df['emissions'].sum()
-        
-        by_category = df.groupby('category')['emissions'].sum().to_dict()
-        by_type = df.groupby('type')['emissions'].sum().to_dict()
+        total, by_type, by_category = _aggregate_snapshot(db.version)
         
         top_contributor = max(by_type, key=by_type.get) if by_type else None
         
-        monthly_avg = total / max(1, (len(set(e['date'][:7] for e in emissions))))
+        monthly_avg = total / max(1, db.get_month_count())
         
         return jsonify({
             'total_emissions_kg': round(total, 2),
             'monthly_average_kg': round(monthly_avg, 2),
-            'by_category': {k: round(v, 2) for k, v in by_category.items()},
-            'by_type': {k: round(v, 2) for k, v in by_type.items()},
+            'by_category': {k: round(v, 2) for k, v in sorted(by_category.items())},
+            'by_type': {k: round(v, 2) for k, v in sorted(by_type.items())},
             'top_contributor': top_contributor,
-            'total_records': len(emissions)
+            'total_records': count
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -230,34 +369,33 @@ def predict_emissions():
     try:
         days_ahead = int(request.args.get('days', 30))
         
-        emissions = db.get_all_emissions()
-        if len(emissions) < 5:
+        if db.get_emissions_count() < 5:
             return jsonify({
                 'success': False,
                 'message': 'Need at least 5 records to make predictions',
                 'predictions': []
             }), 200
         
-        prediction = ml_predictor.predict_future(emissions, days_ahead)
+        # Each gunicorn worker has its own predictor; pick up models retrained by the others
+        ml_predictor.reload_if_changed()
+        prediction = _cached_predict(db.version, ml_predictor.model_version, days_ahead)
         
         return jsonify(prediction), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/get-recommendations', methods=['GET'])
+@cache.cached(timeout=300, make_cache_key=_data_cache_key)
 def get_recommendations():
     """Get eco-friendly recommendations"""
     try:
-        emissions = db.get_all_emissions()
-        
-        if not emissions:
+        if not db.get_emissions_count():
             return jsonify({'recommendations': []}), 200
         
-        df = pd.DataFrame(emissions)
-        by_type = df.groupby('type')['emissions'].sum().to_dict()
+        _, by_type, _ = _aggregate_snapshot(db.version)
         
         recommendations = []
-        for activity_type, total_emissions in sorted(by_type.items(), key=lambda x: x[1], reverse=True)[:3]:
+        for activity_type, total_emissions in heapq.nlargest(3, by_type.items(), key=itemgetter(1)):
             if activity_type in ECO_ALTERNATIVES:
                 alt = ECO_ALTERNATIVES[activity_type]
                 recommendations.append({
@@ -275,11 +413,12 @@ def get_recommendations():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/activity-types', methods=['GET'])
+@etag_conditional(lambda: _ACTIVITY_TYPES_ETAG)
 def get_activity_types():
     """Get list of available activity types"""
     return jsonify({
-        'types': list(EMISSION_FACTORS.keys()),
-        'factors': EMISSION_FACTORS
+        'types': VALID_TYPES_LIST,
+        'factors': dict(EMISSION_FACTORS)
     }), 200
 
 @app.route('/api/delete-emission/<emission_id>', methods=['DELETE'])
@@ -289,9 +428,7 @@ def delete_emission(emission_id):
         db.delete_emission(emission_id)
         
         # Retrain model
-        all_emissions = db.get_all_emissions()
-        if len(all_emissions) >= 5:
-            ml_predictor.train_model(all_emissions)
+        retrain_model(db.get_all_emissions())
         
         return jsonify({
             'success': True,
@@ -301,15 +438,28 @@ def delete_emission(emission_id):
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/export-data', methods=['GET'])
+@etag_conditional(_data_etag)
 def export_data():
-    """Export emissions data as JSON"""
+    """Export emissions data as JSON, streamed one record at a time"""
     try:
-        emissions = db.get_all_emissions()
-        return jsonify({'data': emissions}), 200
+        # Start reading before the response is sent, so failures can still be a 500
+        emissions = db.iter_emissions()
+        first = next(emissions, None)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        yield b'{"data":['
+        if first is not None:
+            yield orjson.dumps(first)
+            for emission in emissions:
+                yield b',' + orjson.dumps(emission)
+        yield b']}'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @app.route('/api/stats', methods=['GET'])
+@cache.cached(timeout=300, make_cache_key=_data_cache_key)
 def get_stats():
     """Get detailed statistics"""
     try:
@@ -339,8 +489,5 @@ if __name__ == '__main__':
     os.makedirs('templates', exist_ok=True)
     os.makedirs('static', exist_ok=True)
     
-    # Load existing model if available
-    ml_predictor.load_model()
-    
-    # Run Flask app
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Serve with gunicorn rather than the single-threaded dev server:
+    #   gunicorn -c gunicorn.conf.py app:app
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os
 from datetime import timedelta
+from types import MappingProxyType
 
 class Config:
     """Base configuration - shared across all environments"""
@@ -20,7 +21,9 @@ class Config:
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000,http://localhost:5000')
     
     # Database Settings
-    DATABASE_FILE = os.environ.get('DATABASE_FILE', 'data/emissions.json')
+    DATABASE_FILE = os.environ.get('DATABASE_FILE', 'data/emissions.ndjson')
+    DATABASE_BACKEND = os.environ.get('DATABASE_BACKEND', 'json')  # 'json' or 'sqlite'
+    SQLITE_DATABASE_FILE = os.environ.get('SQLITE_DATABASE_FILE', 'data/emissions.db')
     
     # ML Model Settings
     MODEL_PATH = os.environ.get('MODEL_PATH', 'models/emission_model.pkl')
@@ -38,12 +41,12 @@ class Config:
     
     # API Settings
     JSON_SORT_KEYS = False
-    JSONIFY_PRETTYPRINT_REGULAR = True
+    JSONIFY_PRETTYPRINT_REGULAR = False
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload
     
     # Cache Settings
-    CACHE_TYPE = 'simple'
+    CACHE_TYPE = 'SimpleCache'
     CACHE_DEFAULT_TIMEOUT = 300
     
     # Logging Settings
@@ -59,7 +62,7 @@ class DevelopmentConfig(Config):
     FLASK_ENV = 'development'
     
     # Use local paths
-    DATABASE_FILE = 'data/emissions.json'
+    DATABASE_FILE = 'data/emissions.ndjson'
     MODEL_PATH = 'models/emission_model.pkl'
     
     # Verbose logging
@@ -81,7 +84,7 @@ class ProductionConfig(Config):
     FLASK_ENV = 'production'
     
     # Production paths (can be overridden by env vars)
-    DATABASE_FILE = os.environ.get('DATABASE_FILE', '/var/data/emissions.json')
+    DATABASE_FILE = os.environ.get('DATABASE_FILE', '/var/data/emissions.ndjson')
     MODEL_PATH = os.environ.get('MODEL_PATH', '/var/models/emission_model.pkl')
     
     # Strict logging
@@ -101,6 +104,15 @@ class ProductionConfig(Config):
     
     # Require HTTPS
     PREFERRED_URL_SCHEME = 'https'
+    
+    # Gunicorn workers and threads per worker. The NDJSON backend keeps its
+    # records in process memory, so only the SQLite backend can share data
+    # across workers; with it the default is one worker per CPU.
+    GUNICORN_WORKERS = int(os.environ.get(
+        'GUNICORN_WORKERS',
+        (os.cpu_count() or 1) if Config.DATABASE_BACKEND == 'sqlite' else 1
+    ))
+    GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 4))
 
 
 class TestingConfig(Config):
@@ -111,11 +123,11 @@ class TestingConfig(Config):
     FLASK_ENV = 'testing'
     
     # Use test database
-    DATABASE_FILE = 'data/test_emissions.json'
+    DATABASE_FILE = 'data/test_emissions.ndjson'
     MODEL_PATH = 'models/test_model.pkl'
     
     # Use in-memory cache for tests
-    CACHE_TYPE = 'simple'
+    CACHE_TYPE = 'SimpleCache'
     CACHE_DEFAULT_TIMEOUT = 0
     
     # Test database
@@ -137,7 +149,7 @@ class StagingConfig(Config):
     FLASK_ENV = 'staging'
     
     # Staging paths
-    DATABASE_FILE = os.environ.get('DATABASE_FILE', '/var/staging/emissions.json')
+    DATABASE_FILE = os.environ.get('DATABASE_FILE', '/var/staging/emissions.ndjson')
     MODEL_PATH = os.environ.get('MODEL_PATH', '/var/staging/model.pkl')
     
     # Moderate logging
@@ -220,6 +232,14 @@ EMISSION_FACTORS = {
 }
 
 
+# Flat, read-only activity type -> factor lookup used when logging emissions
+FLAT_EMISSION_FACTORS = MappingProxyType({
+    activity_type: factor
+    for factors in EMISSION_FACTORS.values()
+    for activity_type, factor in factors.items()
+})
+
+
 # Category Configuration
 ACTIVITY_CATEGORIES = {
     'transport': 'Transportation',
@@ -232,7 +252,7 @@ ACTIVITY_CATEGORIES = {
 
 
 # Eco-Friendly Alternatives Configuration
-ECO_ALTERNATIVES = {
+ECO_ALTERNATIVES = MappingProxyType({
     'car': {
         'alternative': 'Electric Car',
         'reduction_percent': 70,
@@ -296,7 +316,7 @@ ECO_ALTERNATIVES = {
         'cost_savings': 'Often cheaper',
         'implementation_time': '1-2 weeks'
     }
-}
+})
 
 
 # API Rate Limiting
@@ -1,126 +1,547 @@
+import atexit
+import bisect
 import json
 import os
+import queue
+import sqlite3
+import sys
 import uuid
-from datetime import datetime
-from threading import Lock
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from threading import RLock, Thread
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps(obj, indent=False):
+    """Serialize to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _loads(raw):
+    """Parse JSON bytes, with orjson when it is installed"""
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
 
 class Database:
-    """Simple file-based database for emissions data"""
+    """Simple file-based database for emissions data
     
-    def __init__(self, db_file='data/emissions.json'):
+    Records are held in memory and persisted to an append-only NDJSON log:
+    inserts and updates append the full record, deletes append a tombstone,
+    and the log is compacted once dead lines make up a large share of it.
+    Log writes are serialized under the lock and handed to a background
+    writer thread; call flush() to wait for them to reach the file.
+    """
+    
+    # Compact the log once this fraction of its lines no longer holds live records
+    COMPACT_RATIO = 0.3
+    
+    # Record fields drawn from a small set of values, stored as shared strings
+    INTERNED_FIELDS = ('type', 'category')
+    
+    # Record fields in export order
+    COLUMNS = ('id', 'type', 'value', 'emissions', 'date', 'notes', 'category', 'created_at')
+    
+    def __init__(self, db_file='data/emissions.ndjson'):
         self.db_file = db_file
-        self.lock = Lock()
+        self.lock = RLock()
+        self._version = 0
+        self._log_lines = 0
+        # Writes made inside batch() are buffered here and flushed once on exit
+        self._batch_depth = 0
+        self._pending = []
+        self._dirty = False
+        # NumPy date/emissions columns, rebuilt lazily when the version moves on
+        self._columns_version = None
+        # Encoded log writes queued for the writer thread, started on first use
+        self._write_q = queue.Queue()
+        self._writer = None
+        atexit.register(self.close)
         self._ensure_db()
         self.data = self._load_data()
+        self._rebuild_indexes()
     
     def _ensure_db(self):
         """Ensure database file and directory exist"""
         os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
         if not os.path.exists(self.db_file):
-            with open(self.db_file, 'w') as f:
-                json.dump({'emissions': []}, f)
+            self._write_log(self._clean_records(self._load_legacy_data().get('emissions', [])))
+    
+    def _load_legacy_data(self):
+        """Load records from the single JSON document used before the NDJSON log"""
+        legacy_file = os.path.splitext(self.db_file)[0] + '.json'
+        if legacy_file == self.db_file or not os.path.exists(legacy_file):
+            return {'emissions': []}
+        
+        try:
+            with open(legacy_file, 'rb') as f:
+                raw = f.read()
+            return _loads(raw) if raw.strip() else {'emissions': []}
+        except Exception as e:
+            print(f"Error loading legacy data: {str(e)}")
+            return {'emissions': []}
+    
+    @staticmethod
+    def _has_valid_id(emission):
+        """Whether a record carries an ID the log and indexes can key on"""
+        return isinstance(emission.get('id'), str) and bool(emission['id'])
+    
+    def _clean_records(self, emissions):
+        """Drop non-record entries and give ID-less records a fresh ID, keeping the last copy of each ID"""
+        records = {}
+        for emission in emissions:
+            if not isinstance(emission, dict):
+                print(f"Skipping non-record entry: {emission!r}")
+                continue
+            if not self._has_valid_id(emission):
+                emission['id'] = uuid.uuid4().hex
+            records[emission['id']] = self._intern_fields(emission)
+        return list(records.values())
     
     def _load_data(self):
-        """Load data from JSON file"""
+        """Replay the NDJSON log into memory"""
+        records = {}
+        lines = 0
+        rewrite = False
+        
         try:
-            with open(self.db_file, 'r') as f:
-                return json.load(f)
+            with open(self.db_file, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        item = _loads(line)
+                    except json.JSONDecodeError:
+                        # Partial line left by an interrupted write
+                        rewrite = True
+                        continue
+                    if not isinstance(item, dict):
+                        print(f"Skipping non-record line in {self.db_file}: {line[:80]!r}")
+                        rewrite = True
+                        continue
+                    lines += 1
+                    if '_del' in item:
+                        if isinstance(item['_del'], str):
+                            records.pop(item['_del'], None)
+                        continue
+                    if not self._has_valid_id(item):
+                        # Keep the record under a fresh ID, persisted by the rewrite below
+                        item['id'] = uuid.uuid4().hex
+                        rewrite = True
+                    # Later lines for the same ID are updates
+                    records[item['id']] = self._intern_fields(item)
         except Exception as e:
             print(f"Error loading data: {str(e)}")
-            return {'emissions': []}
+        
+        emissions = list(records.values())
+        self._log_lines = lines
+        if rewrite:
+            print(f"Repaired unreadable lines in {self.db_file}, rewriting log")
+            self._write_log(emissions)
+        return {'emissions': emissions}
     
-    def _save_data(self):
-        """Save data to JSON file"""
+    @classmethod
+    def _intern_fields(cls, emission):
+        """Make repeated field values share one string object across records"""
+        for field in cls.INTERNED_FIELDS:
+            value = emission.get(field)
+            if type(value) is str:
+                emission[field] = sys.intern(value)
+        return emission
+    
+    @staticmethod
+    def _date_key(date_str):
+        """Sort key for a record date; ISO 8601 strings sort chronologically"""
+        return date_str if isinstance(date_str, str) else ''
+    
+    def _rebuild_indexes(self):
+        """Rebuild the in-memory indexes from scratch"""
+        emissions = self.data.get('emissions', [])
+        # Records by ID, and by type/category as ID -> record buckets
+        self._by_id = {}
+        self._by_type = defaultdict(dict)
+        self._by_category = defaultdict(dict)
+        # Lowercased (type, notes, record) per ID for search_emissions
+        self._search_text = {}
+        # Running emissions total; (min, max) is recomputed lazily when None
+        self._emissions_total = 0.0
+        self._emissions_range = None
+        # (emissions total, record count) per 'YYYY-MM-DD', 'YYYY-MM' and 'YYYY' date prefix
+        self._daily_totals = {}
+        self._monthly_totals = {}
+        self._yearly_totals = {}
+        # (emissions total, record count) per activity type and per category
+        self._type_totals = {}
+        self._category_totals = {}
+        for e in emissions:
+            self._index_fields(e)
+        keyed = sorted(
+            ((self._date_key(e.get('date')), e) for e in emissions),
+            key=lambda pair: pair[0]
+        )
+        # Parallel lists: sorted date keys and the records they belong to
+        self._date_keys = [key for key, _ in keyed]
+        self._date_records = [e for _, e in keyed]
+    
+    def _total_buckets(self, emission):
+        """Running totals the record counts towards, with its key in each"""
+        date_key = self._date_key(emission.get('date'))
+        return (
+            (self._daily_totals, date_key[:10]),
+            (self._monthly_totals, date_key[:7]),
+            (self._yearly_totals, date_key[:4]),
+            (self._type_totals, emission.get('type')),
+            (self._category_totals, emission.get('category')),
+        )
+    
+    def _index_fields(self, emission):
+        """Add a record to the ID, type and category indexes and running totals"""
+        emission_id = emission.get('id')
+        self._by_id[emission_id] = emission
+        self._by_type[emission.get('type')][emission_id] = emission
+        self._by_category[emission.get('category')][emission_id] = emission
+        self._search_text[emission_id] = (
+            (emission.get('type') or '').lower(),
+            (emission.get('notes') or '').lower(),
+            emission
+        )
+        
+        value = emission.get('emissions', 0)
+        self._emissions_total += value
+        if self._emissions_range is not None:
+            lo, hi = self._emissions_range
+            self._emissions_range = (min(lo, value), max(hi, value))
+        
+        for totals, key in self._total_buckets(emission):
+            total, count = totals.get(key, (0.0, 0))
+            totals[key] = (total + value, count + 1)
+    
+    def _unindex_fields(self, emission):
+        """Remove a record from the ID, type and category indexes and running totals"""
+        emission_id = emission.get('id')
+        self._by_id.pop(emission_id, None)
+        self._search_text.pop(emission_id, None)
+        for index, value in ((self._by_type, emission.get('type')),
+                             (self._by_category, emission.get('category'))):
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.pop(emission_id, None)
+                if not bucket:
+                    del index[value]
+        
+        value = emission.get('emissions', 0)
+        self._emissions_total -= value
+        if self._emissions_range is not None and value in self._emissions_range:
+            self._emissions_range = None
+        
+        for totals, key in self._total_buckets(emission):
+            total, count = totals.get(key, (0.0, 0))
+            if count > 1:
+                totals[key] = (total - value, count - 1)
+            else:
+                totals.pop(key, None)
+    
+    def _index_emission(self, emission):
+        """Add a record to the in-memory indexes"""
+        self._index_fields(emission)
+        key = self._date_key(emission.get('date'))
+        pos = bisect.bisect_right(self._date_keys, key)
+        self._date_keys.insert(pos, key)
+        self._date_records.insert(pos, emission)
+    
+    def _unindex_emission(self, emission):
+        """Remove a record from the in-memory indexes"""
+        self._unindex_fields(emission)
+        key = self._date_key(emission.get('date'))
+        lo = bisect.bisect_left(self._date_keys, key)
+        hi = bisect.bisect_right(self._date_keys, key)
+        for pos in range(lo, hi):
+            if self._date_records[pos] is emission:
+                del self._date_keys[pos]
+                del self._date_records[pos]
+                return
+    
+    @property
+    def version(self):
+        """Counter bumped on every write, used to key response caches"""
+        return self._version
+    
+    @staticmethod
+    def _encode_lines(items):
+        """Encode records or tombstones as NDJSON lines"""
+        return b''.join(_dumps(item) + b'\n' for item in items)
+    
+    def _replace_log(self, payload):
+        """Atomically replace the log file with the given bytes"""
+        tmp_file = f"{self.db_file}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.db_file)
+    
+    def _write_log(self, emissions):
+        """Atomically replace the log with one line per live record, synchronously"""
+        self._replace_log(self._encode_lines(emissions))
+        self._log_lines = len(emissions)
+    
+    def _compact(self):
+        """Queue a rewrite of the log without superseded records and tombstones"""
         try:
             with self.lock:
-                with open(self.db_file, 'w') as f:
-                    json.dump(self.data, f, indent=2)
+                self._submit(True, self._encode_lines(self.data['emissions']))
+                self._log_lines = len(self.data['emissions'])
         except Exception as e:
-            print(f"Error saving data: {str(e)}")
+            print(f"Error compacting data: {str(e)}")
     
-    def add_emission(self, emission_data):
-        """Add new emission record"""
-        emission_id = str(uuid.uuid4())
+    def _submit(self, rewrite, payload):
+        """Queue encoded log bytes for the writer thread, starting it if needed"""
+        with self.lock:
+            if self._writer is None:
+                self._writer = Thread(target=self._writer_loop, name='emissions-log-writer', daemon=True)
+                self._writer.start()
+            self._write_q.put((rewrite, payload))
+    
+    def _writer_loop(self):
+        """Apply queued log writes, coalescing whatever piled up since the last pass"""
+        while True:
+            ops = [self._write_q.get()]
+            while True:
+                try:
+                    ops.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # A rewrite holds the whole log, so anything queued before it is moot
+            rewrite = None
+            appended = []
+            for op in ops:
+                if op is None:
+                    continue
+                if op[0]:
+                    rewrite, appended = op[1], []
+                else:
+                    appended.append(op[1])
+            
+            try:
+                if rewrite is not None:
+                    self._replace_log(rewrite)
+                if appended:
+                    with open(self.db_file, 'ab') as f:
+                        f.write(b''.join(appended))
+            except Exception as e:
+                print(f"Error saving data: {str(e)}")
+            
+            for _ in ops:
+                self._write_q.task_done()
+            if None in ops:
+                return
+    
+    def flush(self):
+        """Block until queued log writes have reached the file"""
+        self._write_q.join()
+    
+    def close(self):
+        """Finish queued log writes and stop the writer thread"""
+        with self.lock:
+            if self._writer is not None:
+                self._write_q.put(None)
+                self._writer.join()
+                self._writer = None
+    
+    def _append(self, items):
+        """Append records or tombstones to the log"""
+        with self.lock:
+            self._version += 1
+            self._pending.extend(items)
+            if not self._batch_depth:
+                self._flush()
+    
+    def _save_data(self):
+        """Rewrite the whole log from the in-memory data"""
+        with self.lock:
+            self._version += 1
+            self._dirty = True
+            if not self._batch_depth:
+                self._flush()
+    
+    def _flush(self):
+        """Write buffered changes, rewriting the log if a full save is due"""
+        with self.lock:
+            pending, self._pending = self._pending, []
+            if self._dirty:
+                self._dirty = False
+                self._compact()
+                return
+            if not pending:
+                return
+            
+            try:
+                self._submit(False, self._encode_lines(pending))
+                self._log_lines += len(pending)
+            except Exception as e:
+                print(f"Error saving data: {str(e)}")
+            
+            dead_lines = self._log_lines - len(self.data['emissions'])
+            if dead_lines > self.COMPACT_RATIO * self._log_lines:
+                self._compact()
+    
+    @contextmanager
+    def batch(self):
+        """Group several writes so they reach disk in a single flush"""
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._flush()
+    
+    def _build_entry(self, emission_data):
+        """Build a new emission record with a fresh ID"""
+        now_iso = datetime.now().isoformat()
         
-        entry = {
-            'id': emission_id,
+        return self._intern_fields({
+            'id': uuid.uuid4().hex,
             'type': emission_data.get('type', ''),
             'value': emission_data.get('value', 0),
             'emissions': emission_data.get('emissions', 0),
-            'date': emission_data.get('date', datetime.now().isoformat()),
+            'date': emission_data.get('date') or now_iso,
             'notes': emission_data.get('notes', ''),
             'category': emission_data.get('category', 'general'),
-            'created_at': datetime.now().isoformat()
-        }
+            'created_at': now_iso
+        })
+    
+    def add_emission(self, emission_data):
+        """Add new emission record"""
+        entry = self._build_entry(emission_data)
         
-        self.data['emissions'].append(entry)
-        self._save_data()
+        with self.lock:
+            self.data['emissions'].append(entry)
+            self._index_emission(entry)
+            self._append([entry])
         return entry
     
+    def add_emissions_bulk(self, emissions_data):
+        """Add several emission records with a single save"""
+        with self.batch():
+            return [self.add_emission(emission_data) for emission_data in emissions_data]
+    
     def get_all_emissions(self):
         """Get all emission records"""
         return self.data.get('emissions', [])
     
+    def iter_emissions(self):
+        """Iterate over a snapshot of the emission records, copying the list but not the records"""
+        with self.lock:
+            emissions = list(self.data.get('emissions', []))
+        yield from emissions
+    
     def get_emission_by_id(self, emission_id):
         """Get specific emission record by ID"""
-        for emission in self.data.get('emissions', []):
-            if emission['id'] == emission_id:
-                return emission
-        return None
+        return self._by_id.get(emission_id)
+    
+    def get_emissions_since(self, cutoff=None):
+        """Get emissions dated after cutoff (all if None), newest first"""
+        with self.lock:
+            start = 0
+            if cutoff is not None:
+                start = bisect.bisect_right(self._date_keys, cutoff.isoformat())
+            return self._date_records[start:][::-1]
     
     def delete_emission(self, emission_id):
         """Delete emission record by ID"""
-        self.data['emissions'] = [
-            e for e in self.data['emissions'] if e['id'] != emission_id
-        ]
-        self._save_data()
+        with self.lock:
+            emission = self._by_id.get(emission_id)
+            if emission is not None:
+                self._unindex_emission(emission)
+                self.data['emissions'].remove(emission)
+                self._append([{'_del': emission_id}])
         return True
     
     def update_emission(self, emission_id, updated_data):
         """Update emission record"""
-        for i, emission in enumerate(self.data['emissions']):
-            if emission['id'] == emission_id:
-                self.data['emissions'][i].update(updated_data)
-                self._save_data()
-                return self.data['emissions'][i]
-        return None
+        with self.lock:
+            emission = self._by_id.get(emission_id)
+            if emission is None:
+                return None
+            self._unindex_emission(emission)
+            emission.update(updated_data)
+            self._intern_fields(emission)
+            self._index_emission(emission)
+            self._append([emission])
+            return emission
     
     def get_emissions_by_type(self, activity_type):
         """Get emissions filtered by activity type"""
-        return [e for e in self.data['emissions'] if e['type'] == activity_type]
+        return list(self._by_type.get(activity_type, {}).values())
     
     def get_emissions_by_category(self, category):
         """Get emissions filtered by category"""
-        return [e for e in self.data['emissions'] if e['category'] == category]
+        return list(self._by_category.get(category, {}).values())
+    
+    @staticmethod
+    def _to_datetime64(date_str, unit='us'):
+        """Parse an ISO 8601 string to datetime64, NaT if it is unreadable"""
+        try:
+            return np.datetime64(date_str, unit)
+        except (TypeError, ValueError):
+            return np.datetime64('NaT', unit)
+    
+    def _columns(self):
+        """Record dates and emissions as parallel NumPy arrays"""
+        with self.lock:
+            if self._columns_version != self._version:
+                emissions = self.data['emissions']
+                dates = [e.get('date') for e in emissions]
+                try:
+                    date_column = np.array(dates, dtype='datetime64[us]')
+                except (TypeError, ValueError):
+                    date_column = np.array([self._to_datetime64(d) for d in dates], dtype='datetime64[us]')
+                self._date_column = date_column
+                self._value_column = np.fromiter(
+                    (e.get('emissions', 0) for e in emissions), dtype=np.float64, count=len(emissions)
+                )
+                self._columns_version = self._version
+            return self.data['emissions'], self._date_column, self._value_column
     
     def get_emissions_by_date_range(self, start_date, end_date):
         """Get emissions within date range"""
-        emissions = []
-        for emission in self.data['emissions']:
-            try:
-                emit_date = datetime.fromisoformat(emission['date'])
-                if start_date <= emit_date <= end_date:
-                    emissions.append(emission)
-            except ValueError:
-                continue
-        return emissions
+        emissions, dates, _ = self._columns()
+        mask = (dates >= np.datetime64(start_date, 'us')) & (dates <= np.datetime64(end_date, 'us'))
+        return [emissions[i] for i in np.flatnonzero(mask)]
     
     def get_statistics(self):
         """Get database statistics"""
-        emissions = self.data.get('emissions', [])
-        if not emissions:
-            return {
-                'total_records': 0,
-                'total_emissions_kg': 0,
-                'average_emission': 0,
-                'min_emission': 0,
-                'max_emission': 0
-            }
+        with self.lock:
+            emissions = self.data.get('emissions', [])
+            if not emissions:
+                return {
+                    'total_records': 0,
+                    'total_emissions_kg': 0,
+                    'average_emission': 0,
+                    'min_emission': 0,
+                    'max_emission': 0
+                }
+            
+            if self._emissions_range is None:
+                values = [e.get('emissions', 0) for e in emissions]
+                self._emissions_range = (min(values), max(values))
+            min_emission, max_emission = self._emissions_range
+            total_emissions = self._emissions_total
         
-        total_emissions = sum(e['emissions'] for e in emissions)
         avg_emissions = total_emissions / len(emissions)
-        min_emission = min(e['emissions'] for e in emissions)
-        max_emission = max(e['emissions'] for e in emissions)
         
         return {
             'total_records': len(emissions),
@@ -132,24 +553,27 @@ class Database:
     
     def clear_all(self):
         """Clear all emissions data (use with caution)"""
-        self.data = {'emissions': []}
-        self._save_data()
+        with self.lock:
+            self.data = {'emissions': []}
+            self._rebuild_indexes()
+            self._save_data()
         return True
     
     def export_to_csv(self, filename='emissions_export.csv'):
         """Export data to CSV file"""
         try:
             import csv
-            emissions = self.data.get('emissions', [])
-            
-            if not emissions:
+            if not self.get_emissions_count():
                 return False
             
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                fieldnames = emissions[0].keys()
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(emissions)
+            # Rows are streamed one at a time through a 1 MiB write buffer
+            with open(filename, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+                writer = csv.writer(f)
+                writer.writerow(self.COLUMNS)
+                writer.writerows(
+                    [emission.get(column, '') for column in self.COLUMNS]
+                    for emission in self.iter_emissions()
+                )
             
             return True
         except Exception as e:
@@ -159,10 +583,10 @@ class Database:
     def export_to_json(self, filename='emissions_export.json'):
         """Export data to JSON file"""
         try:
-            emissions = self.data.get('emissions', [])
+            emissions = self.get_all_emissions()
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(emissions, f, indent=2)
+            with open(filename, 'wb') as f:
+                f.write(_dumps(emissions, indent=True))
             
             return True
         except Exception as e:
@@ -172,46 +596,45 @@ class Database:
     def search_emissions(self, query):
         """Search emissions by notes or type"""
         query_lower = query.lower()
-        results = []
-        
-        for emission in self.data['emissions']:
-            if (query_lower in emission.get('type', '').lower() or
-                query_lower in emission.get('notes', '').lower()):
-                results.append(emission)
         
-        return results
+        with self.lock:
+            return [
+                emission for type_lower, notes_lower, emission in self._search_text.values()
+                if query_lower in type_lower or query_lower in notes_lower
+            ]
+    
+    def get_month_count(self):
+        """Get number of distinct months that have emission records"""
+        return len(self._monthly_totals)
     
     def get_emissions_count(self):
         """Get total count of emissions"""
         return len(self.data.get('emissions', []))
     
+    def get_emission_totals(self):
+        """Get total emissions overall, by type and by category"""
+        with self.lock:
+            return (
+                self._emissions_total,
+                {key: total for key, (total, _) in self._type_totals.items()},
+                {key: total for key, (total, _) in self._category_totals.items()}
+            )
+    
     def get_last_n_emissions(self, n=10):
         """Get last N emission records"""
-        emissions = self.data.get('emissions', [])
-        return sorted(emissions, key=lambda x: x['date'], reverse=True)[:n]
+        with self.lock:
+            records = self._date_records
+            return records[max(len(records) - n, 0):][::-1]
     
     def get_daily_total(self, date_str):
         """Get total emissions for a specific date"""
         date_str = date_str.split('T')[0]  # Extract just the date part
-        daily_total = 0
-        
-        for emission in self.data['emissions']:
-            emission_date = emission['date'].split('T')[0]
-            if emission_date == date_str:
-                daily_total += emission['emissions']
-        
+        daily_total, _ = self._daily_totals.get(date_str, (0.0, 0))
         return round(daily_total, 2)
     
     def get_monthly_totals(self, year, month):
         """Get total emissions for a specific month"""
-        monthly_total = 0
-        count = 0
-        
-        for emission in self.data['emissions']:
-            emission_date = datetime.fromisoformat(emission['date'])
-            if emission_date.year == year and emission_date.month == month:
-                monthly_total += emission['emissions']
-                count += 1
+        monthly_total, count = self._monthly_totals.get(f'{year:04d}-{month:02d}', (0.0, 0))
         
         return {
             'total_kg': round(monthly_total, 2),
@@ -221,14 +644,7 @@ class Database:
     
     def get_yearly_totals(self, year):
         """Get total emissions for a specific year"""
-        yearly_total = 0
-        count = 0
-        
-        for emission in self.data['emissions']:
-            emission_date = datetime.fromisoformat(emission['date'])
-            if emission_date.year == year:
-                yearly_total += emission['emissions']
-                count += 1
+        yearly_total, count = self._yearly_totals.get(f'{year:04d}', (0.0, 0))
         
         return {
             'total_kg': round(yearly_total, 2),
@@ -242,8 +658,8 @@ class Database:
             if backup_filename is None:
                 backup_filename = f"backup_emissions_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
-            with open(backup_filename, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2)
+            with open(backup_filename, 'wb') as f:
+                f.write(_dumps({'emissions': self.get_all_emissions()}, indent=True))
             
             return True
         except Exception as e:
@@ -253,10 +669,372 @@ class Database:
     def restore_database(self, backup_filename):
         """Restore database from backup"""
         try:
-            with open(backup_filename, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-            self._save_data()
+            with open(backup_filename, 'rb') as f:
+                data = _loads(f.read())
+            with self.lock:
+                self.data = {'emissions': self._clean_records(data.get('emissions', []))}
+                self._rebuild_indexes()
+                self._save_data()
+            return True
+        except Exception as e:
+            print(f"Error restoring backup: {str(e)}")
+            return False
+
+
+class SQLiteDatabase(Database):
+    """SQLite-backed emissions database with the same interface as Database
+    
+    Records live in an indexed ``emissions`` table, so lookups and
+    aggregates run as B-tree queries and writes only touch changed pages.
+    """
+    
+    INSERT_SQL = (
+        f"INSERT INTO emissions ({', '.join(Database.COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(Database.COLUMNS))})"
+    )
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS emissions (
+            id TEXT PRIMARY KEY,
+            type TEXT,
+            value REAL,
+            emissions REAL,
+            date TEXT,
+            notes TEXT,
+            category TEXT,
+            created_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_emissions_type ON emissions(type);
+        CREATE INDEX IF NOT EXISTS idx_emissions_category ON emissions(category);
+        CREATE INDEX IF NOT EXISTS idx_emissions_date ON emissions(date);
+    """
+    
+    # Trigram tokenizer gives case-insensitive substring matching like search_emissions
+    FTS_SCHEMA = """
+        CREATE VIRTUAL TABLE emissions_fts USING fts5(
+            type, notes, content='emissions', content_rowid='rowid', tokenize='trigram'
+        );
+        CREATE TRIGGER emissions_fts_insert AFTER INSERT ON emissions BEGIN
+            INSERT INTO emissions_fts(rowid, type, notes) VALUES (new.rowid, new.type, new.notes);
+        END;
+        CREATE TRIGGER emissions_fts_delete AFTER DELETE ON emissions BEGIN
+            INSERT INTO emissions_fts(emissions_fts, rowid, type, notes)
+                VALUES ('delete', old.rowid, old.type, old.notes);
+        END;
+        CREATE TRIGGER emissions_fts_update AFTER UPDATE ON emissions BEGIN
+            INSERT INTO emissions_fts(emissions_fts, rowid, type, notes)
+                VALUES ('delete', old.rowid, old.type, old.notes);
+            INSERT INTO emissions_fts(rowid, type, notes) VALUES (new.rowid, new.type, new.notes);
+        END;
+        INSERT INTO emissions_fts(emissions_fts) VALUES ('rebuild');
+    """
+    
+    def __init__(self, db_file='data/emissions.db'):
+        self.db_file = db_file
+        self.lock = RLock()
+        self._version = 0
+        self._batch_depth = 0
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        
+        # Wait up to 30 s for other workers' write locks before giving up
+        self._conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(self.SCHEMA)
+        self._fts = self._ensure_fts()
+    
+    def _ensure_fts(self):
+        """Create the full-text search index if SQLite supports it"""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'emissions_fts'"
+        ).fetchone()
+        if exists:
+            return True
+        
+        try:
+            self._conn.executescript(self.FTS_SCHEMA)
+            return True
+        except sqlite3.OperationalError as e:
+            print(f"Full-text search unavailable, using LIKE: {str(e)}")
+            return False
+    
+    @property
+    def version(self):
+        """Counter bumped on every write, including commits from other processes"""
+        with self.lock:
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        return self._version + data_version
+    
+    def _query(self, sql, params=()):
+        """Run a SELECT and return the rows as dicts"""
+        with self.lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+    
+    def _scalar(self, sql, params=()):
+        """Run a SELECT returning a single value"""
+        with self.lock:
+            return self._conn.execute(sql, params).fetchone()[0]
+    
+    def _write(self, sql, rows):
+        """Run a write statement for each parameter row, committing unless batched"""
+        with self.lock:
+            try:
+                cursor = self._conn.executemany(sql, rows)
+                self._version += 1
+                if not self._batch_depth:
+                    self._conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                if not self._batch_depth:
+                    self._conn.rollback()
+                print(f"Error saving data: {str(e)}")
+                raise
+    
+    @contextmanager
+    def batch(self):
+        """Run several writes in one transaction, rolled back if any of them fails"""
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                if self._batch_depth == 1:
+                    self._conn.rollback()
+                raise
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._flush()
+    
+    def _flush(self):
+        """Commit the writes made inside batch() as one transaction"""
+        with self.lock:
+            self._conn.commit()
+    
+    def _insert(self, entries):
+        """Insert new records"""
+        self._write(
+            self.INSERT_SQL,
+            [tuple(entry[column] for column in self.COLUMNS) for entry in entries]
+        )
+    
+    def add_emission(self, emission_data):
+        """Add new emission record"""
+        entry = self._build_entry(emission_data)
+        self._insert([entry])
+        return entry
+    
+    def add_emissions_bulk(self, emissions_data):
+        """Add several emission records in a single transaction"""
+        entries = [self._build_entry(emission_data) for emission_data in emissions_data]
+        self._insert(entries)
+        return entries
+    
+    def get_all_emissions(self):
+        """Get all emission records"""
+        return self._query('SELECT * FROM emissions ORDER BY rowid')
+    
+    def iter_emissions(self):
+        """Iterate over emission records without loading them all at once"""
+        with self.lock:
+            cursor = self._conn.execute('SELECT * FROM emissions ORDER BY rowid')
+            rows = cursor.fetchmany(500)
+        while rows:
+            for row in rows:
+                yield dict(row)
+            with self.lock:
+                rows = cursor.fetchmany(500)
+    
+    def get_emission_by_id(self, emission_id):
+        """Get specific emission record by ID"""
+        rows = self._query('SELECT * FROM emissions WHERE id = ?', (emission_id,))
+        return rows[0] if rows else None
+    
+    def get_emissions_since(self, cutoff=None):
+        """Get emissions dated after cutoff (all if None), newest first"""
+        if cutoff is None:
+            return self._query('SELECT * FROM emissions ORDER BY date DESC')
+        return self._query(
+            'SELECT * FROM emissions WHERE date > ? ORDER BY date DESC',
+            (cutoff.isoformat(),)
+        )
+    
+    def delete_emission(self, emission_id):
+        """Delete emission record by ID"""
+        self._write('DELETE FROM emissions WHERE id = ?', [(emission_id,)])
+        return True
+    
+    def update_emission(self, emission_id, updated_data):
+        """Update emission record"""
+        columns = [column for column in self.COLUMNS if column in updated_data and column != 'id']
+        if columns:
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            self._write(
+                f'UPDATE emissions SET {assignments} WHERE id = ?',
+                [tuple(updated_data[column] for column in columns) + (emission_id,)]
+            )
+        return self.get_emission_by_id(emission_id)
+    
+    def get_emissions_by_type(self, activity_type):
+        """Get emissions filtered by activity type"""
+        return self._query('SELECT * FROM emissions WHERE type = ? ORDER BY rowid', (activity_type,))
+    
+    def get_emissions_by_category(self, category):
+        """Get emissions filtered by category"""
+        return self._query('SELECT * FROM emissions WHERE category = ? ORDER BY rowid', (category,))
+    
+    def get_emissions_by_date_range(self, start_date, end_date):
+        """Get emissions within date range"""
+        # Date-only records ('YYYY-MM-DD') sort before that day's 'T00:00:00',
+        # so a midnight start bound is compared on the date alone
+        if start_date.time() == datetime.min.time():
+            start = start_date.date().isoformat()
+        else:
+            start = start_date.isoformat()
+        return self._query(
+            'SELECT * FROM emissions WHERE date >= ? AND date <= ? ORDER BY rowid',
+            (start, end_date.isoformat())
+        )
+    
+    def get_statistics(self):
+        """Get database statistics"""
+        with self.lock:
+            count, total, avg, lo, hi = self._conn.execute(
+                'SELECT COUNT(*), SUM(emissions), AVG(emissions), MIN(emissions), MAX(emissions) '
+                'FROM emissions'
+            ).fetchone()
+        
+        if not count:
+            return {
+                'total_records': 0,
+                'total_emissions_kg': 0,
+                'average_emission': 0,
+                'min_emission': 0,
+                'max_emission': 0
+            }
+        
+        return {
+            'total_records': count,
+            'total_emissions_kg': round(total, 2),
+            'average_emission_kg': round(avg, 2),
+            'min_emission_kg': round(lo, 2),
+            'max_emission_kg': round(hi, 2)
+        }
+    
+    def clear_all(self):
+        """Clear all emissions data (use with caution)"""
+        self._write('DELETE FROM emissions', [()])
+        return True
+    
+    def search_emissions(self, query):
+        """Search emissions by notes or type"""
+        # Trigram matching needs at least three characters
+        if self._fts and len(query) >= 3:
+            phrase = '"' + query.replace('"', '""') + '"'
+            return self._query(
+                'SELECT emissions.* FROM emissions_fts '
+                'JOIN emissions ON emissions.rowid = emissions_fts.rowid '
+                'WHERE emissions_fts MATCH ? ORDER BY emissions.rowid',
+                (phrase,)
+            )
+        
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return self._query(
+            "SELECT * FROM emissions WHERE type LIKE ? ESCAPE '\\' OR notes LIKE ? ESCAPE '\\' "
+            'ORDER BY rowid',
+            (pattern, pattern)
+        )
+    
+    def get_month_count(self):
+        """Get number of distinct months that have emission records"""
+        return self._scalar('SELECT COUNT(DISTINCT substr(date, 1, 7)) FROM emissions')
+    
+    def get_emissions_count(self):
+        """Get total count of emissions"""
+        return self._scalar('SELECT COUNT(*) FROM emissions')
+    
+    def get_emission_totals(self):
+        """Get total emissions overall, by type and by category"""
+        by_type = defaultdict(float)
+        by_category = defaultdict(float)
+        for row in self._query(
+            'SELECT type, category, SUM(emissions) AS total FROM emissions GROUP BY type, category'
+        ):
+            by_type[row['type']] += row['total']
+            by_category[row['category']] += row['total']
+        return sum(by_type.values()), dict(by_type), dict(by_category)
+    
+    def get_last_n_emissions(self, n=10):
+        """Get last N emission records"""
+        return self._query('SELECT * FROM emissions ORDER BY date DESC LIMIT ?', (n,))
+    
+    def _sum_between(self, start, end):
+        """Total and count of emissions with start <= date < end"""
+        with self.lock:
+            return self._conn.execute(
+                'SELECT COALESCE(SUM(emissions), 0), COUNT(*) FROM emissions '
+                'WHERE date >= ? AND date < ?',
+                (start, end)
+            ).fetchone()
+    
+    def get_daily_total(self, date_str):
+        """Get total emissions for a specific date"""
+        date_str = date_str.split('T')[0]  # Extract just the date part
+        try:
+            next_day = (datetime.fromisoformat(date_str) + timedelta(days=1)).date().isoformat()
+        except ValueError:
+            return 0
+        
+        daily_total, _ = self._sum_between(date_str, next_day)
+        return round(daily_total, 2)
+    
+    def get_monthly_totals(self, year, month):
+        """Get total emissions for a specific month"""
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        monthly_total, count = self._sum_between(
+            f'{year:04d}-{month:02d}', f'{next_year:04d}-{next_month:02d}'
+        )
+        
+        return {
+            'total_kg': round(monthly_total, 2),
+            'count': count,
+            'average_kg': round(monthly_total / count, 2) if count > 0 else 0
+        }
+    
+    def get_yearly_totals(self, year):
+        """Get total emissions for a specific year"""
+        yearly_total, count = self._sum_between(f'{year:04d}', f'{year + 1:04d}')
+        
+        return {
+            'total_kg': round(yearly_total, 2),
+            'count': count,
+            'average_daily_kg': round(yearly_total / 365, 2)
+        }
+    
+    def restore_database(self, backup_filename):
+        """Restore database from backup"""
+        try:
+            with open(backup_filename, 'rb') as f:
+                data = _loads(f.read())
+            
+            rows = [
+                tuple(emission.get(column) for column in self.COLUMNS)
+                for emission in self._clean_records(data.get('emissions', []))
+            ]
+            with self.lock:
+                with self._conn:
+                    self._conn.execute('DELETE FROM emissions')
+                    self._conn.executemany(self.INSERT_SQL, rows)
+                self._version += 1
             return True
         except Exception as e:
             print(f"Error restoring backup: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+    
+    def flush(self):
+        """Writes are committed synchronously, so there is nothing to wait for"""
+    
+    def close(self):
+        """Close the database connection"""
+        with self.lock:
+            self._conn.close()
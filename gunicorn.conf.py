@@ -0,0 +1,29 @@
+# ============================================================================
+# GUNICORN CONFIGURATION - CARBON FOOTPRINT MONITOR
+# ============================================================================
+# Run with: gunicorn -c gunicorn.conf.py app:app
+# ============================================================================
+
+from config import ProductionConfig
+
+# Server socket
+bind = f"{ProductionConfig.FLASK_HOST}:{ProductionConfig.FLASK_PORT}"
+
+# Worker processes, each serving requests on a small thread pool.
+# The NDJSON backend holds its data in process memory, so it runs a single
+# worker and scales with threads; use DATABASE_BACKEND=sqlite for more.
+workers = ProductionConfig.GUNICORN_WORKERS
+if ProductionConfig.DATABASE_BACKEND != 'sqlite' and workers > 1:
+    print(f"GUNICORN_WORKERS={workers} needs DATABASE_BACKEND=sqlite; running 1 worker")
+    workers = 1
+worker_class = 'gthread'
+threads = ProductionConfig.GUNICORN_THREADS
+
+# Timeouts
+timeout = 120
+keepalive = 5
+
+# Logging (to stdout/stderr)
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
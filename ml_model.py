@@ -1,8 +1,9 @@
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.inspection import permutation_importance
 from datetime import datetime, timedelta
+from threading import Lock
 import joblib
 import os
 
@@ -12,9 +13,20 @@ class EmissionPredictor:
     def __init__(self, model_path='models/emission_model.pkl'):
         self.model_path = model_path
         self.model = None
-        self.scaler = StandardScaler()
         self.feature_names = None
+        # Feature name -> column position, cached whenever a model is swapped in
+        self._fidx = {}
+        # (X, y) the current model was fitted on, used for permutation importances
+        self._train_data = None
+        # Date span and typical activity of the training history, see _summarize
+        self._summary = None
         self.is_trained = False
+        # Bumped whenever a new model is swapped in, used to key prediction caches
+        self.model_version = 0
+        # Guards swapping in a newly trained model while predictions run
+        self._lock = Lock()
+        # mtime of the model file this process last wrote or loaded
+        self._model_mtime = None
         self._ensure_model_dir()
     
     def _ensure_model_dir(self):
@@ -24,7 +36,8 @@ class EmissionPredictor:
     def _prepare_features(self, emissions_data):
         """Prepare features from raw emission data"""
         df = pd.DataFrame(emissions_data)
-        df['date'] = pd.to_datetime(df['date'])
+        # Dates are stored as ISO 8601; a fixed format parses them in one vectorized pass
+        df['date'] = pd.to_datetime(df['date'], format='ISO8601')
         df = df.sort_values('date')
         
         # Create time-based features
@@ -48,6 +61,18 @@ class EmissionPredictor:
         
         return features, target, df, features.columns.tolist()
     
+    def _summarize(self, df):
+        """Date span and typical activity of a history, the inputs predict_future extrapolates from"""
+        type_mode = df['type'].mode()
+        category_mode = df['category'].mode()
+        return {
+            'first_date': df['date'].min(),
+            'last_date': df['date'].max(),
+            'avg_value': df['value'].mean(),
+            'avg_type': type_mode.iat[0] if len(type_mode) > 0 else df['type'].iloc[0],
+            'avg_category': category_mode.iat[0] if len(category_mode) > 0 else df['category'].iloc[0]
+        }
+    
     def train_model(self, emissions_data):
         """Train ML model on emission data"""
         if len(emissions_data) < 5:
@@ -56,23 +81,34 @@ class EmissionPredictor:
         
         try:
             X, y, df, feature_names = self._prepare_features(emissions_data)
-            self.feature_names = feature_names
             
-            # Use Gradient Boosting for better performance
-            self.model = GradientBoostingRegressor(
-                n_estimators=100,
+            # Histogram-based Gradient Boosting: binned, multi-threaded split finding
+            model = HistGradientBoostingRegressor(
+                max_iter=100,
                 learning_rate=0.1,
                 max_depth=5,
-                random_state=42,
-                subsample=0.8
+                min_samples_leaf=1,  # histories are small; the default of 20 allows no splits
+                random_state=42
             )
             
-            self.model.fit(X, y)
-            self.is_trained = True
+            # Fit on a plain float matrix, the same layout predict_future builds
+            X = X.to_numpy(dtype=np.float64)
+            y = y.to_numpy(dtype=np.float64)
+            model.fit(X, y)
+            
+            summary = self._summarize(df)
+            self._publish(model, feature_names, summary, (X, y))
             
-            # Save model
-            joblib.dump(self.model, self.model_path)
-            self.scaler.fit(X)
+            # Save model together with its feature layout and history summary,
+            # atomically so other workers never load a half-written file
+            tmp_path = f"{self.model_path}.{os.getpid()}.tmp"
+            joblib.dump(
+                {'model': model, 'feature_names': feature_names, 'summary': summary},
+                tmp_path,
+                compress=3
+            )
+            os.replace(tmp_path, self.model_path)
+            self._model_mtime = os.stat(self.model_path).st_mtime_ns
             
             print(f"Model trained successfully with {len(emissions_data)} records")
             return True
@@ -80,12 +116,31 @@ class EmissionPredictor:
             print(f"Error training model: {str(e)}")
             return False
     
+    def _publish(self, model, feature_names, summary=None, train_data=None):
+        """Swap in a fitted model so predictions never see a half-trained one"""
+        with self._lock:
+            self.model = model
+            self.feature_names = feature_names
+            self._fidx = {name: i for i, name in enumerate(feature_names)}
+            self._summary = summary
+            self._train_data = train_data
+            self.is_trained = True
+            self.model_version += 1
+    
     def load_model(self):
         """Load pre-trained model from disk"""
         if os.path.exists(self.model_path):
             try:
-                self.model = joblib.load(self.model_path)
-                self.is_trained = True
+                mtime = os.stat(self.model_path).st_mtime_ns
+                saved = joblib.load(self.model_path)
+                if isinstance(saved, dict):
+                    model, feature_names = saved['model'], saved['feature_names']
+                    summary = saved.get('summary')
+                else:
+                    # Older files hold the bare estimator, fitted on a named DataFrame
+                    model, feature_names, summary = saved, list(saved.feature_names_in_), None
+                self._publish(model, feature_names, summary)
+                self._model_mtime = mtime
                 print(f"Model loaded from {self.model_path}")
                 return True
             except Exception as e:
@@ -93,12 +148,32 @@ class EmissionPredictor:
                 return False
         return False
     
-    def predict_future(self, emissions_data, days_ahead=30):
-        """Predict emissions for future days"""
-        if not self.is_trained and len(emissions_data) >= 5:
+    def reload_if_changed(self):
+        """Load the model file again if another process has saved a newer one"""
+        try:
+            mtime = os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._model_mtime:
+            return False
+        return self.load_model()
+    
+    def predict_future(self, emissions_data=None, days_ahead=30):
+        """Predict emissions for future days
+        
+        Extrapolates from emissions_data, or from the history the model was
+        trained on when emissions_data is None.
+        """
+        if not self.is_trained and emissions_data is not None and len(emissions_data) >= 5:
             self.train_model(emissions_data)
         
-        if not self.is_trained or self.model is None:
+        # Use the last successfully trained model, even if a retrain is running
+        with self._lock:
+            model = self.model
+            feature_index = self._fidx
+            summary = self._summary
+        
+        if not self.is_trained or model is None or (emissions_data is None and summary is None):
             return {
                 'success': False,
                 'error': 'Model not trained. Need historical data.',
@@ -106,43 +181,47 @@ class EmissionPredictor:
             }
         
         try:
-            df = pd.DataFrame(emissions_data)
-            df['date'] = pd.to_datetime(df['date'])
-            df = df.sort_values('date')
+            if emissions_data is not None:
+                df = pd.DataFrame(emissions_data)
+                df['date'] = pd.to_datetime(df['date'], format='ISO8601')
+                summary = self._summarize(df)
             
             # Get last known date
-            last_date = df['date'].max()
-            last_day_index = (last_date - df['date'].min()).days
+            last_date = summary['last_date']
+            last_day_index = (last_date - summary['first_date']).days
             
             # Calculate average features
-            avg_value = df['value'].mean()
-            avg_activity_type = df['type'].mode()[0] if len(df['type'].mode()) > 0 else df['type'].iloc[0]
-            avg_category = df['category'].mode()[0] if len(df['category'].mode()) > 0 else df['category'].iloc[0]
+            avg_value = summary['avg_value']
+            avg_activity_type = summary['avg_type']
+            avg_category = summary['avg_category']
             
-            predictions = []
+            future_dates = pd.date_range(last_date + timedelta(days=1), periods=days_ahead, freq='D')
             
-            for i in range(1, days_ahead + 1):
-                future_date = last_date + timedelta(days=i)
-                
-                # Create feature vector
-                feature_dict = {name: 0 for name in self.feature_names}
-                
-                feature_dict['days_since_start'] = last_day_index + i
-                feature_dict['day_of_week'] = future_date.dayofweek
-                feature_dict['day_of_month'] = future_date.day
-                feature_dict['month'] = future_date.month
-                feature_dict['value'] = avg_value
-                feature_dict[f'activity_{avg_activity_type}'] = 1
-                feature_dict[f'category_{avg_category}'] = 1
-                
-                X_future = np.array([feature_dict.get(name, 0) for name in self.feature_names]).reshape(1, -1)
-                pred = self.model.predict(X_future)[0]
-                pred = max(0, pred)  # Ensure non-negative
-                
-                predictions.append({
+            # Build one feature row per future day and predict them in a single call
+            X_future = np.zeros((days_ahead, len(feature_index)))
+            columns = {
+                'days_since_start': last_day_index + np.arange(1, days_ahead + 1),
+                'day_of_week': future_dates.dayofweek,
+                'day_of_month': future_dates.day,
+                'month': future_dates.month,
+                'value': avg_value,
+                f'activity_{avg_activity_type}': 1,
+                f'category_{avg_category}': 1,
+            }
+            for name, column in columns.items():
+                i = feature_index.get(name)
+                if i is not None:
+                    X_future[:, i] = column
+            
+            preds = np.maximum(model.predict(X_future), 0)  # Ensure non-negative
+            
+            predictions = [
+                {
                     'date': future_date.isoformat(),
-                    'predicted_emissions_kg': round(pred, 2)
-                })
+                    'predicted_emissions_kg': round(float(pred), 2)
+                }
+                for future_date, pred in zip(future_dates, preds)
+            ]
             
             avg_predicted = np.mean([p['predicted_emissions_kg'] for p in predictions])
             trend = 'increasing' if predictions[-1]['predicted_emissions_kg'] > predictions[0]['predicted_emissions_kg'] else 'decreasing'
@@ -164,12 +243,20 @@ class EmissionPredictor:
     
     def get_feature_importance(self):
         """Get feature importance from model"""
-        if self.model is None or not self.is_trained:
+        with self._lock:
+            model = self.model
+            feature_names = self.feature_names
+            train_data = self._train_data
+        
+        # Importances are measured on the training data, which a loaded model lacks
+        if model is None or not self.is_trained or train_data is None:
             return {}
         
         try:
-            importances = self.model.feature_importances_
-            feature_importance = dict(zip(self.feature_names, importances))
+            # Histogram boosting has no impurity importances; use the score drop when a feature is shuffled
+            X, y = train_data
+            result = permutation_importance(model, X, y, n_repeats=5, random_state=42)
+            feature_importance = dict(zip(feature_names, result.importances_mean))
             sorted_importance = dict(sorted(feature_importance.items(), key=lambda x: x[1], reverse=True))
             return sorted_importance
         except Exception as e:
@@ -178,19 +265,23 @@ class EmissionPredictor:
     
     def predict_single(self, emission_record):
         """Predict emissions for a single record"""
-        if not self.is_trained or self.model is None:
+        with self._lock:
+            model = self.model
+            feature_index = self._fidx
+        
+        if not self.is_trained or model is None:
             return None
         
         try:
-            feature_dict = {name: 0 for name in self.feature_names}
+            X = np.zeros((1, len(feature_index)))
             
             # Set available features
             for key, value in emission_record.items():
-                if key in feature_dict:
-                    feature_dict[key] = value
+                i = feature_index.get(key)
+                if i is not None:
+                    X[0, i] = value
             
-            X = np.array([feature_dict.get(name, 0) for name in self.feature_names]).reshape(1, -1)
-            prediction = self.model.predict(X)[0]
+            prediction = model.predict(X)[0]
             return max(0, prediction)
         except Exception as e:
             print(f"Error predicting single record: {str(e)}")
@@ -206,8 +297,9 @@ class EmissionPredictor:
         
         return {
             'status': 'trained',
-            'model_type': 'GradientBoostingRegressor',
-            'n_estimators': self.model.n_estimators,
+            'model_type': type(self.model).__name__,
+            # Legacy model files hold a GradientBoostingRegressor sized by n_estimators
+            'max_iter': getattr(self.model, 'max_iter', getattr(self.model, 'n_estimators', None)),
             'learning_rate': self.model.learning_rate,
             'max_depth': self.model.max_depth,
             'n_features': len(self.feature_names) if self.feature_names else 0,